@@ -76,6 +76,9 @@ def get_arguments():
     github_group.add_argument('-gt', "--github_token",
                                     help="Path to the GitHub token file",
                                     type=FileType('r'))
+    github_group.add_argument('-gw', "--github_webhook_secret",
+                                    help="Path to the GitHub webhook secret file",
+                                    type=FileType('r'))
     # HTTP server-related arguments
     http_server_group = parser.add_argument_group('HTTP server configuration')
     http_server_group.add_argument('-a', "--address",
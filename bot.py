@@ -6,72 +6,151 @@ Triage bot for user feedback handling.
 This bot serves as a bridge between user feedback and the development team.
 It transfers user feedback to a Telegram channel for triage,
 and then transfers the feedback voted to be useful to GitHub.
+
+The aiogram, aiohttp and PyGithub based modules are imported
+only after the arguments are parsed, so that the process starts quickly.
 """
 
 import asyncio
-from logging import basicConfig as loggingConfig, INFO
+from logging import basicConfig as loggingConfig, INFO, info, warning
 from pathlib import Path
 from argparse import Namespace
+from signal import SIGINT, SIGTERM
 from arguments import get_arguments, ensure_tokens
-from github_issue import GitHubSender
-from rotation import rotate
-from webserver import TriageWebServer
-from telegram import TriageTelegramBot
 from config import Config
 
+async def shutdown(ws_instance, telegram_bot, rotation_instance, timeout):
+    """
+    Drain the bot within a deadline: stop accepting feedback,
+    let the rotation finish its current message, stop polling
+    and wait for the GitHub issues being created.
+
+    Whatever is unfinished by the deadline stays in the rotation
+    directory, the issue journal and the message index
+    for the next instance.
+
+    Args:
+        ws_instance (TriageWebServer): HTTP server instance
+        telegram_bot (TriageTelegramBot): bot instance
+        rotation_instance (asyncio.Task): rotation task
+        timeout (float): shutdown deadline in seconds
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    info('Shutting down')
+    await ws_instance.stop()
+    telegram_bot.stop()
+    _, pending = await asyncio.wait(
+        [rotation_instance], timeout=max(0, deadline - loop.time())
+    )
+    for task in pending:
+        task.cancel()
+    try:
+        await telegram_bot.dispatcher.stop_polling()
+    except RuntimeError:
+        # Polling has not started or has already stopped
+        pass
+    unfinished = await telegram_bot.drain(max(0, deadline - loop.time()))
+    if unfinished:
+        warning(f'{unfinished} issue(s) left in the journal for the next start')
+    if telegram_bot.status_queue:
+        warning(
+            f'Status edits of {len(telegram_bot.status_queue)} issue(s) '
+            'left in the message index for the next start'
+        )
+
 async def main():
     """
     Enable logging, configure the Telegram bot,
-    configure the server, start both.
+    configure the server, start both
+    and run them until SIGINT or SIGTERM is received.
     """
+    # pylint: disable=import-outside-toplevel
     # Parse the command-line arguments
     input_args: Namespace = get_arguments()
     # Load the tokens from the environment or secrets
     telegram_token, github_token = ensure_tokens(
         input_args, ['telegram_token', 'github_token']
     )
+    # The GitHub webhook is optional
+    try:
+        webhook_secret, = ensure_tokens(input_args, ['github_webhook_secret'])
+    except ValueError:
+        webhook_secret = None
     # Load config
-    config = Config(input_args.config)    
+    config = Config(input_args.config)
     # Configure logging
     loggingConfig(level=INFO)
+    # Import the heavy dependencies once the input is validated
+    from github_issue import GitHubSender
+    from rotation import rotate
+    from webserver import TriageWebServer
+    from telegram import TriageTelegramBot
+    from store import JsonStore
+    from tenants import TenantRegistry
+    from issue_index import synchronize
+    from http_pool import ConnectionPools
     # Configure the rotation
     rotation_path = Path(input_args.rotation_path).absolute()
+    tenants = TenantRegistry(config, rotation_path)
+    pools = ConnectionPools(config)
+    shutdown_timeout = config.get('shutdown_timeout', 8)
     # Configure the GitHub sender
     github_sender = GitHubSender(
         github_token,
-        config.get('github_repository')
+        config.get('github_repository'),
+        rotation_path / 'issues',
+        pools
     )
     # Configure the Telegram bot
     telegram_bot = TriageTelegramBot(
         token=telegram_token,
         github_sender=github_sender,
-        config=config
+        config=config,
+        issue_journal=JsonStore(rotation_path / 'journal'),
+        message_index=JsonStore(rotation_path / 'messages'),
+        tenants=tenants,
+        pools=pools
     )
-    telegram_bot_runner = telegram_bot.runner()
+    # Handle the termination signals
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (SIGINT, SIGTERM):
+        loop.add_signal_handler(signum, stop_event.set)
     # Configure server
-    ws_instance = TriageWebServer(rotation_path)
-    http_server = asyncio.create_task(ws_instance.start_http_server(
+    ws_instance = TriageWebServer(tenants, shutdown_timeout, webhook_secret)
+    await ws_instance.start_http_server(
         bot=telegram_bot,
         address=input_args.address,
         port=input_args.port
-    ))
-    # Set up file rotation
-    rotation_instance = asyncio.create_task(
-        rotate(
-            telegram_bot,
-            rotation_path,
-            config.get('feedback_rotation_interval')
-        )
     )
-    # Gather all AsyncIO runners
-    return await asyncio.gather(telegram_bot_runner, http_server, rotation_instance)
-
-if __name__ == "__main__":
-    loop = asyncio.get_event_loop()
-    runners = []
     try:
-        _, webserver, __ = asyncio.run(main())
-        runners.append(webserver.runner)
+        async with asyncio.TaskGroup() as tasks:
+            tasks.create_task(telegram_bot.runner())
+            # Set up file rotation
+            rotation_instance = tasks.create_task(
+                rotate(
+                    telegram_bot,
+                    tenants,
+                    config.get('feedback_rotation_interval')
+                )
+            )
+            # Keep the local issue indexes up to date
+            index_sync = tasks.create_task(
+                synchronize(
+                    telegram_bot,
+                    tenants,
+                    config.get('issue_index_sync_interval', 300)
+                )
+            )
+            await stop_event.wait()
+            index_sync.cancel()
+            await shutdown(
+                ws_instance, telegram_bot, rotation_instance, shutdown_timeout
+            )
     finally:
-        for runner in runners:
-            loop.run_until_complete(runner.cleanup())
+        await ws_instance.stop()
+        await pools.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -39,17 +39,18 @@ class Config:
         with open(self.config_path, 'r', encoding='utf-8') as config_file:
             self.data = load(config_file)
 
-    def get(self, key):
+    def get(self, key, default=None):
         """
         Get the value associated with a specific key from the configuration.
 
         Args:
             key (str): The key for which to retrieve the value.
+            default (Any): The value to return if the key is not found.
 
         Returns:
-            Any: The value associated with the key, or None if the key is not found.
+            Any: The value associated with the key, or the default if the key is not found.
         """
-        return self.data.get(key)
+        return self.data.get(key, default)
 
     def set(self, key, value):
         """
@@ -1,35 +1,154 @@
-from github import Github
-from github import Auth
-
 """
 GitHub interface library.
+
+PyGithub is imported lazily, on the first issue creation,
+since it is slow to import and is not needed to start the bot.
+A single PyGithub client is reused for all issues, sized
+with the "github" connection pool settings; the asynchronous requests
+go through the shared "github" pool session.
 """
 
+import asyncio
+from time import monotonic
+from threading import Lock
+from pathlib import Path
+from aiohttp import ClientError, ClientTimeout
+from issue_index import IssueIndex
+
 class GitHubSender:
 
-    def __init__(self, token, repository):
+    # Cache lifetime of the GitHub reachability check, in seconds
+    reachability_ttl = 60
+    # The rate limit endpoint does not count against the API quota
+    reachability_url = 'https://api.github.com/rate_limit'
+
+    def __init__(self, token, repository, index_path: Path, pools):
         """
         Args:
             token (str): GitHub application token
             repository (str): a string pointing to the GitHub account and repo,
                               like "username/some_repository"
+            index_path (pathlib.Path): the directory to keep the issue indexes in
+            pools (ConnectionPools): the shared connection pools
         """
         self.token = token
+        self.pools = pools
+        self.client = None
+        self.client_lock = Lock()
         self.repository = repository
+        self.index_path = index_path
+        self.indexes = {}
+        self.reachable = None
+        self.reachability_checked = None
+        self.reachability_check = None
 
-    def create_issue(self, title, text):
+    def create_issue(self, title, text, repository=None):
         """
         Create a GitHub issue
 
         Args:
             title (str): issue title
             text (str): issue text
-        
+            repository (str): the repository to create the issue in,
+                              the default one if None
+
         Returns:
             (issue): GitHub issue instance
         """
-        auth = Auth.Token(self.token)
-        g = Github(auth=auth)
-        repo = g.get_repo(self.repository)
+        repository = repository or self.repository
+        repo = self.get_repo(repository)
         issue_inst = repo.create_issue(title=title, body=text)
-        return f'https://github.com/{self.repository}/issues/{issue_inst.number}'
+        return f'https://github.com/{repository}/issues/{issue_inst.number}'
+
+    def comment_issue(self, number, text, repository=None):
+        """
+        Comment on an existing GitHub issue
+
+        Args:
+            number (int): issue number
+            text (str): comment text
+            repository (str): the repository of the issue,
+                              the default one if None
+        """
+        repo = self.get_repo(repository or self.repository, lazy=True)
+        repo.get_issue(number).create_comment(text)
+
+    def get_repo(self, repository, lazy=False):
+        """
+        Returns:
+            (github.Repository.Repository): PyGithub repository instance
+        """
+        # Issues are created in worker threads
+        with self.client_lock:
+            if self.client is None:
+                # pylint: disable=import-outside-toplevel
+                from github import Auth, Github
+                pool_settings = self.pools.settings('github')
+                self.client = Github(
+                    auth=Auth.Token(self.token),
+                    pool_size=pool_settings['limit'],
+                    timeout=pool_settings['total_timeout']
+                )
+        return self.client.get_repo(repository, lazy=lazy)
+
+    def index_for(self, repository=None):
+        """
+        Returns:
+            IssueIndex: the local issue index of a repository,
+                        the default one if None
+        """
+        repository = repository or self.repository
+        # Repository names are case-insensitive
+        key = repository.lower()
+        if key not in self.indexes:
+            self.indexes[key] = IssueIndex(repository, self.index_path)
+        return self.indexes[key]
+
+    async def sync_index(self, repository=None):
+        """
+        Fetch the issues updated since the last synchronization
+        of a repository index.
+
+        Returns:
+            (bool): False if the repository has not changed
+        """
+        return await self.index_for(repository).sync(
+            self.pools.session('github'), self.token
+        )
+
+    def is_reachable(self):
+        """
+        Report whether the GitHub API responded to the last check.
+
+        The check runs in the background when the last result is older
+        than `reachability_ttl` seconds, so that the readiness probe
+        never waits for GitHub.
+
+        Returns:
+            (bool or None): True if the last check succeeded,
+                            None until the first check completes
+        """
+        now = monotonic()
+        if self.reachability_check is None and (
+            self.reachability_checked is None or
+            now - self.reachability_checked >= self.reachability_ttl
+        ):
+            self.reachability_checked = now
+            self.reachability_check = asyncio.create_task(self.check_reachability())
+        return self.reachable
+
+    async def check_reachability(self):
+        """
+        Check whether the GitHub API responds and store the result.
+        """
+        try:
+            async with self.pools.session('github').get(
+                self.reachability_url,
+                headers={'Authorization': f'Bearer {self.token}'},
+                timeout=ClientTimeout(total=5)
+            ) as resp:
+                self.reachable = resp.status == 200
+        except (ClientError, TimeoutError):
+            self.reachable = False
+        finally:
+            self.reachability_check = None
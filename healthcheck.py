@@ -2,18 +2,30 @@
 
 """
 This file contains a healthcheck script for the bot.
+
+It only uses the standard library, so that the interpreter
+starts quickly; run it with `python -I -S` to skip the site packages.
+The readiness URL can be overridden with the HEALTHCHECK_URL
+environment variable.
 """
 
 import sys
-from asyncio import run
-from aiohttp import ClientSession
+from os import getenv
+from http.client import HTTPConnection, HTTPException
+from urllib.parse import urlsplit
 
-async def main():
+def main():
     # pylint: disable=C0116
-    async with ClientSession() as session:
-        req = await session.get('http://127.0.0.1:8080')
-        if req.status != 200:
+    url = urlsplit(getenv('HEALTHCHECK_URL', 'http://127.0.0.1:8080/healthz'))
+    connection = HTTPConnection(url.hostname, url.port or 80, timeout=5)
+    try:
+        connection.request('GET', url.path or '/')
+        if connection.getresponse().status != 200:
             sys.exit(1)
+    except (OSError, HTTPException):
+        sys.exit(1)
+    finally:
+        connection.close()
 
 if __name__ == '__main__':
-    run(main())
+    main()
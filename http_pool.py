@@ -0,0 +1,184 @@
+"""
+This module manages the outbound HTTP connection pools of the bot.
+
+All outbound HTTP traffic goes through a few long-lived, named aiohttp
+sessions ("telegram" and "github"), so that connections and DNS lookups
+are reused between requests instead of being made for every request.
+
+The pools are tuned with the optional "http_pools" config section,
+keyed by the pool name:
+
+    {
+        "http_pools": {
+            "telegram": {"limit": 50, "keepalive_timeout": 60},
+            "github": {"limit": 10, "total_timeout": 30}
+        }
+    }
+
+Classes:
+    - PoolStats: request and connection counters of a pool.
+    - ConnectionPools: the named sessions of the bot.
+"""
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, TraceConfig
+
+class PoolStats:
+    """
+    Request and connection counters of a pool,
+    collected with aiohttp client tracing.
+    """
+
+    def __init__(self):
+        self.requests_in_flight = 0
+        self.requests_total = 0
+        self.requests_failed = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.connections_queued = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def trace_config(self) -> TraceConfig:
+        """
+        Returns:
+            TraceConfig: aiohttp trace configuration updating the counters
+        """
+        trace_config = TraceConfig()
+        trace_config.on_request_start.append(self.on_request_start)
+        trace_config.on_request_end.append(self.on_request_end)
+        trace_config.on_request_exception.append(self.on_request_exception)
+        trace_config.on_connection_create_end.append(
+            self.counter('connections_created')
+        )
+        trace_config.on_connection_reuseconn.append(
+            self.counter('connections_reused')
+        )
+        trace_config.on_connection_queued_start.append(
+            self.counter('connections_queued')
+        )
+        trace_config.on_dns_cache_hit.append(self.counter('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(self.counter('dns_cache_misses'))
+        return trace_config
+
+    def counter(self, name):
+        """
+        Returns:
+            (coroutine function): a trace signal handler incrementing a counter
+        """
+        async def increment(*_):
+            setattr(self, name, getattr(self, name) + 1)
+        return increment
+
+    async def on_request_start(self, *_):
+        # pylint: disable=C0116
+        self.requests_in_flight += 1
+        self.requests_total += 1
+
+    async def on_request_end(self, *_):
+        # pylint: disable=C0116
+        self.requests_in_flight -= 1
+
+    async def on_request_exception(self, *_):
+        # pylint: disable=C0116
+        self.requests_in_flight -= 1
+        self.requests_failed += 1
+
+class ConnectionPools:
+    """
+    The named, shared HTTP sessions of the bot.
+
+    Example usage:
+
+        pools = ConnectionPools(config)
+        session = pools.session('github')
+        async with session.get('https://api.github.com/rate_limit') as resp:
+            print(resp.status)
+        print(pools.stats())
+        await pools.close()
+    """
+
+    defaults = {
+        # Maximum number of simultaneous connections
+        'limit': 100,
+        # Maximum number of simultaneous connections to a single host, 0 for no limit
+        'limit_per_host': 0,
+        # Seconds to keep an idle connection open for reuse
+        'keepalive_timeout': 30,
+        # Seconds to cache the resolved host addresses for
+        'ttl_dns_cache': 300,
+        # Request timeouts, in seconds
+        'connect_timeout': 10,
+        'total_timeout': 60
+    }
+
+    def __init__(self, config):
+        """
+        Args:
+            config (Config): bot configuration
+        """
+        self.config = config
+        self.sessions = {}
+        self.pool_stats = {}
+
+    def settings(self, name):
+        """
+        Returns:
+            dict: the settings of a pool, with the defaults filled in
+        """
+        pool_settings = dict(self.defaults)
+        pool_settings.update(self.config.get('http_pools', {}).get(name, {}))
+        return pool_settings
+
+    def session(self, name) -> ClientSession:
+        """
+        Get a pool session, creating it on the first use.
+        Must be called from the running event loop.
+
+        Args:
+            name (str): pool name
+
+        Returns:
+            ClientSession: the shared session of the pool
+        """
+        session = self.sessions.get(name)
+        if session is None or session.closed:
+            pool_settings = self.settings(name)
+            stats = self.pool_stats.setdefault(name, PoolStats())
+            connector = TCPConnector(
+                limit=pool_settings['limit'],
+                limit_per_host=pool_settings['limit_per_host'],
+                keepalive_timeout=pool_settings['keepalive_timeout'],
+                ttl_dns_cache=pool_settings['ttl_dns_cache']
+            )
+            session = ClientSession(
+                connector=connector,
+                timeout=ClientTimeout(
+                    total=pool_settings['total_timeout'],
+                    connect=pool_settings['connect_timeout']
+                ),
+                trace_configs=[stats.trace_config()]
+            )
+            self.sessions[name] = session
+        return session
+
+    def stats(self):
+        """
+        Returns:
+            dict: the limits and counters of every pool used so far
+        """
+        return {
+            name: {
+                'limit': self.settings(name)['limit'],
+                'limit_per_host': self.settings(name)['limit_per_host'],
+                **vars(stats)
+            }
+            for name, stats in self.pool_stats.items()
+        }
+
+    async def close(self):
+        """
+        Close all pool sessions.
+        """
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions = {}
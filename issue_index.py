@@ -0,0 +1,282 @@
+"""
+This module keeps a local index of the GitHub issues of a repository,
+used to find an open issue that already describes a feedback entry
+before a new one is created.
+
+The index is synchronized incrementally: only the issues updated since the
+last synchronization are requested. A response is only valid for the `since`
+value it was requested with, so its ETag is kept together with that value and
+sent back while `since` stays the same: once the index has caught up with a
+change, an unchanged repository costs a single "304 Not Modified" response
+that does not count against the API quota.
+
+Issues are compared by the Jaccard similarity of their word shingles
+(overlapping three-word sequences); an inverted index from shingles to issues
+keeps the lookup independent of the repository size.
+
+Classes:
+    - IssueIndex: the issues of a single repository.
+"""
+
+import asyncio
+from re import findall
+from json import dump, load
+from logging import warning
+from os import replace
+from pathlib import Path
+from zlib import crc32
+from collections import Counter, defaultdict
+
+SHINGLE_SIZE = 3
+
+def parse_feedback(text: str):
+    """
+    Split a rendered feedback message into its page location and content,
+    leaving out the header lines shared by all feedback messages.
+
+    Args:
+        text (str): feedback message or issue text
+
+    Returns:
+        (tuple): location (str or None) and content (str)
+    """
+    location = None
+    content = []
+    for line_number, line in enumerate(text.splitlines()):
+        if line.startswith('Page: '):
+            location = line[len('Page: '):].strip()
+        elif line.startswith('User: ') or \
+             (line_number == 0 and line.endswith('Feedback')):
+            continue
+        else:
+            content.append(line)
+    return location, '\n'.join(content)
+
+def shingles(text: str) -> set:
+    """
+    Returns:
+        set: stable hashes of the word shingles of a text
+    """
+    words = findall(r'\w+', text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {crc32(word.encode()) for word in words}
+    return {
+        crc32(' '.join(words[pos:pos + SHINGLE_SIZE]).encode())
+        for pos in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+class IssueIndex:
+    """
+    A local index of the issues of a GitHub repository,
+    persisted to a JSON file.
+
+    Example usage:
+
+        index = IssueIndex('username/some_repository', Path('./rotation/issues'))
+        await index.sync(session, token)
+        issue = index.find_duplicate(tg_message.text, 0.5)
+    """
+
+    api_url = 'https://api.github.com'
+
+    def __init__(self, repository, store_path: Path):
+        """
+        Args:
+            repository (str): a string pointing to the GitHub account and repo,
+                              like "username/some_repository"
+            store_path (pathlib.Path): the directory to keep the index in
+        """
+        self.repository = repository
+        store_path.mkdir(parents=True, exist_ok=True)
+        self.index_path = store_path / f'{repository.replace("/", "__")}.json'
+        self.issues = {}
+        self.postings = defaultdict(set)
+        self.since = None
+        self.etag = None
+        # The `since` value the ETag was received for
+        self.etag_since = None
+        self.load()
+
+    def load(self):
+        """
+        Load the index saved by a previous run, if any.
+        """
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as index_file:
+                data = load(index_file)
+        except FileNotFoundError:
+            return
+        self.since = data.get('since')
+        self.etag = data.get('etag')
+        self.etag_since = data.get('etag_since')
+        for number, issue in data.get('issues', {}).items():
+            issue['shingles'] = set(issue['shingles'])
+            self.put(int(number), issue)
+
+    def save(self):
+        """
+        Save the index, replacing the previous file atomically.
+        """
+        data = {
+            'since': self.since,
+            'etag': self.etag,
+            'etag_since': self.etag_since,
+            'issues': {
+                number: dict(issue, shingles=sorted(issue['shingles']))
+                for number, issue in self.issues.items()
+            }
+        }
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as index_file:
+            dump(data, index_file, ensure_ascii=False)
+        replace(tmp_path, self.index_path)
+
+    def put(self, number, issue):
+        """
+        Add or replace an issue record and update the inverted index.
+
+        Args:
+            number (int): issue number
+            issue (dict): issue record with the title, URL, state,
+                          page location and shingles
+        """
+        previous = self.issues.get(number)
+        if previous is not None:
+            for shingle in previous['shingles']:
+                self.postings[shingle].discard(number)
+        self.issues[number] = issue
+        for shingle in issue['shingles']:
+            self.postings[shingle].add(number)
+
+    def add(self, number, title, text, url, state='open'):
+        """
+        Index an issue from its title and text.
+        """
+        location, content = parse_feedback(text or '')
+        self.put(number, {
+            'title': title,
+            'url': url,
+            'state': state,
+            'location': location,
+            'shingles': shingles(content)
+        })
+
+    def set_state(self, number, state):
+        """
+        Update the state of an indexed issue, like "open" or "closed".
+        Unknown issues are left to the next synchronization.
+        """
+        issue = self.issues.get(number)
+        if issue is not None:
+            issue['state'] = state
+
+    def find_duplicate(self, text, threshold):
+        """
+        Find the open issue most similar to a feedback message.
+
+        Issues about a different page are never considered duplicates.
+
+        Args:
+            text (str): feedback message text
+            threshold (float): minimal Jaccard similarity, from 0 to 1
+
+        Returns:
+            (dict or None): the issue record with its number,
+                            None if there is no similar open issue
+        """
+        location, content = parse_feedback(text)
+        text_shingles = shingles(content)
+        shared = Counter()
+        for shingle in text_shingles:
+            shared.update(self.postings.get(shingle, ()))
+        best, best_score = None, threshold
+        for number, shared_count in shared.items():
+            issue = self.issues[number]
+            if issue['state'] != 'open':
+                continue
+            if location and issue['location'] and issue['location'] != location:
+                continue
+            score = shared_count / (
+                len(text_shingles) + len(issue['shingles']) - shared_count
+            )
+            if score >= best_score:
+                best, best_score = dict(issue, number=number), score
+        return best
+
+    async def sync(self, session, token):
+        """
+        Fetch the issues updated since the last synchronization.
+
+        Args:
+            session (aiohttp.ClientSession): HTTP session
+            token (str): GitHub application token
+
+        Returns:
+            (bool): False if the repository has not changed
+
+        Raises:
+            aiohttp.ClientError: If the GitHub API request fails.
+        """
+        headers = {
+            'Accept': 'application/vnd.github+json',
+            'Authorization': f'Bearer {token}'
+        }
+        # After a change, `since` moves on and the first request for it
+        # is unconditional; the ETag it returns is reused from then on
+        if self.etag and self.etag_since == self.since:
+            headers['If-None-Match'] = self.etag
+        url = f'{self.api_url}/repos/{self.repository}/issues'
+        params = {'state': 'all', 'sort': 'updated', 'direction': 'asc', 'per_page': 100}
+        request_since = self.since
+        if request_since:
+            params['since'] = request_since
+        etag = None
+        while url:
+            async with session.get(url, params=params, headers=headers) as resp:
+                if resp.status == 304:
+                    return False
+                resp.raise_for_status()
+                # Only the first page is requested conditionally
+                headers.pop('If-None-Match', None)
+                etag = etag or resp.headers.get('ETag')
+                for item in await resp.json():
+                    self.since = max(self.since or '', item['updated_at'])
+                    if 'pull_request' in item:
+                        continue
+                    self.add(
+                        item['number'], item['title'], item['body'],
+                        item['html_url'], item['state']
+                    )
+                # The next page link carries the query parameters
+                url = resp.links.get('next', {}).get('url')
+                params = None
+        self.etag = etag
+        self.etag_since = request_since
+        self.save()
+        return True
+
+async def synchronize(bot, tenants, sleep_interval=300):
+    """
+    Periodically synchronize the issue indexes of the tenant repositories.
+
+    Args:
+        bot (TriageTelegramBot): Bot instance.
+        tenants (TenantRegistry): Tenants to synchronize the repositories of.
+        sleep_interval (int): Synchronization delay in seconds.
+    """
+    while bot.running:
+        repositories = {tenant.get('github_repository') for tenant in tenants}
+        for repository in repositories:
+            if not repository:
+                continue
+            try:
+                await bot.github_sender.sync_index(repository)
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                # The index is only a cache; a failed synchronization
+                # must not stop the bot
+                warning(f'Unable to synchronize the issues of {repository}: {exc!r}')
+        # Wake up early when the bot is stopping
+        try:
+            await asyncio.wait_for(bot.stopping.wait(), sleep_interval)
+        except TimeoutError:
+            pass
@@ -3,55 +3,89 @@ This module provides functions to manage the rotation of unsent feedback message
 and ensure they are sent to the designated group chat. It includes utilities for
 finding and processing JSON files containing feedback data and sending the messages
 with a vote button for user interaction.
+
+Every tenant gets a turn on each rotation tick, within its rate budget,
+so a tenant with many pending messages does not delay the others.
+The pending GitHub issue status edits are sent on every tick as well,
+within the same budgets.
 """
 
 import asyncio
 from json import load
-from pathlib import Path
+from logging import warning
 from aiogram.exceptions import AiogramError
 from telegram import render_feedback_msg, generate_keyboard
 
-def find_single_file(directory_path, extension):
+# Names of the tenants already reported to have no Telegram group
+unregistered_tenants = set()
+
+async def send_next(bot, tenant):
     """
-    Find a single file in the specified directory.
+    Send the next pending feedback message of a tenant, if its rate budget allows.
 
     Args:
-        directory_path (str or Path): The path to the directory to search for a JSON file.
-        extension (str): File extension, e.g., 'json'
-
-    Returns:
-        Path or None: Returns the path to the found file or None if not found.
+        bot (TriageTelegramBot): Bot instance.
+        tenant (Tenant): The tenant to serve.
     """
-    directory = Path(directory_path)
-    if directory.is_dir():
-        for file_path in directory.glob(f'*.{extension}'):
-            return file_path
-    return None
+    rfile = tenant.spool.next()
+    if not rfile:
+        return
+    if tenant.get('telegram_group_id') is None:
+        # Keep the records until the group is registered with `/register_group`;
+        # the warning is only logged once per tenant
+        if tenant.name not in unregistered_tenants:
+            unregistered_tenants.add(tenant.name)
+            warning(
+                f'No Telegram group is registered for {tenant.name}; '
+                'its feedback stays in the rotation directory'
+            )
+        return
+    unregistered_tenants.discard(tenant.name)
+    if not tenant.rate_budget.try_acquire():
+        return
+    try:
+        with open(rfile, 'r', encoding='utf-8') as rfile_inst:
+            req_data = load(rfile_inst)
+    except FileNotFoundError:
+        # The record was removed from outside of the bot
+        tenant.spool.remove(rfile)
+        return
+    text = await render_feedback_msg(req_data)
+    # Add a button to the feedback message
+    builder = await generate_keyboard()
+    try:
+        await bot.send_to_telegram_group_id(
+            text, tenant=tenant, reply_markup=builder.as_markup()
+        )
+        tenant.spool.remove(rfile)
+    except AiogramError:
+        pass
 
-async def rotate(bot, rotation_path, sleep_interval=1):
+async def rotate(bot, tenants, sleep_interval=1):
     """
-    Checks the path to unsent messages and sends them later to ensure they are sent.
+    Checks the paths to unsent messages and sends them later to ensure they are sent.
 
     Args:
         bot (TriageTelegramBot): Bot instance.
-        rotation_path (pathlib.Path): Path to check.
+        tenants (TenantRegistry): Tenants to check the rotation partitions of.
         sleep_interval (int): Check delay in seconds.
     """
     while bot.running:
-        text = None
-        rfile = find_single_file(rotation_path, 'json')
-        if rfile:
-            with open(rfile, 'r', encoding='utf-8') as rfile_inst:
-                req_data = load(rfile_inst)
-                text = await render_feedback_msg(req_data)
-        if text:
-            # Add a button to the feedback message
-            builder = await generate_keyboard()
+        for tenant in tenants.round_robin():
+            if not bot.running:
+                break
             try:
-                await bot.send_to_telegram_group_id(
-                    text, reply_markup=builder.as_markup()
-                )
-                rfile.unlink()
-            except AiogramError:
-                pass
-        await asyncio.sleep(sleep_interval)
+                await send_next(bot, tenant)
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                # The record stays in the spool; an error of one tenant
+                # must not stop the rotation of the others
+                warning(f'Unable to send the feedback of {tenant.name}: {exc!r}')
+        try:
+            await bot.send_status_edits()
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            warning(f'Unable to send the issue status edits: {exc!r}')
+        # Wake up early when the bot is stopping
+        try:
+            await asyncio.wait_for(bot.stopping.wait(), sleep_interval)
+        except TimeoutError:
+            pass
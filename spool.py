@@ -0,0 +1,123 @@
+"""
+This module stores the feedback records waiting to be sent to Telegram.
+
+The records are spread over hashed shard subdirectories of a rotation
+partition, `<partition>/<2 hex digits>/<record id>.json`, so that no
+directory grows too large. The pending records are kept in an in-memory
+index, built once on start and updated on every write and removal,
+so the next record is found without listing the directories.
+
+Classes:
+    - Spool: a sharded directory of pending feedback records.
+"""
+
+from os import replace, scandir
+from collections import OrderedDict
+from hashlib import blake2b
+from pathlib import Path
+from hash import file_id_generator
+
+def is_shard_name(name: str) -> bool:
+    """
+    Returns:
+        bool: True if the name is a shard directory name, like "3f"
+    """
+    return len(name) == 2 and all(char in '0123456789abcdef' for char in name)
+
+class Spool:
+    """
+    A sharded directory of pending feedback records.
+
+    Example usage:
+
+        spool = Spool(Path('./rotation'))
+        spool.write('{"feedback": "Typo in the tutorial"}')
+        record_path = spool.next()
+        spool.remove(record_path)
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path (pathlib.Path): the partition directory, created if missing
+        """
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.shards = set()
+        # An insertion-ordered set of the pending record paths; unlike dict,
+        # OrderedDict finds its first key in constant time after removals
+        self.index = OrderedDict()
+        self.scan()
+
+    def __len__(self):
+        return len(self.index)
+
+    def scan(self):
+        """
+        Build the index from the partition directory, oldest records first.
+
+        Records written to the partition root before it was sharded
+        are picked up as well.
+        """
+        entries = []
+        with scandir(self.path) as top_entries:
+            for entry in top_entries:
+                if entry.is_dir() and is_shard_name(entry.name):
+                    self.shards.add(entry.name)
+                    with scandir(entry.path) as shard_entries:
+                        entries.extend(
+                            shard_entry for shard_entry in shard_entries
+                            if shard_entry.name.endswith('.json') and shard_entry.is_file()
+                        )
+                elif entry.name.endswith('.json') and entry.is_file():
+                    entries.append(entry)
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        self.index = OrderedDict((Path(entry.path), None) for entry in entries)
+
+    def record_path(self, record_id: str) -> Path:
+        """
+        Returns:
+            Path: the path of a record in its shard directory
+        """
+        shard = blake2b(record_id.encode(), digest_size=1).hexdigest()
+        if shard not in self.shards:
+            (self.path / shard).mkdir(exist_ok=True)
+            self.shards.add(shard)
+        return self.path / shard / f'{record_id}.json'
+
+    def write(self, data: str) -> Path:
+        """
+        Store a new record.
+
+        The record is written to a temporary file first and renamed,
+        so that a partially written record is never sent.
+
+        Args:
+            data (str): JSON record data
+
+        Returns:
+            Path: the path of the new record
+        """
+        record_path = self.record_path(file_id_generator())
+        while record_path in self.index:
+            record_path = self.record_path(file_id_generator())
+        tmp_path = record_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as record_file:
+            record_file.write(data)
+        replace(tmp_path, record_path)
+        self.index[record_path] = None
+        return record_path
+
+    def next(self):
+        """
+        Returns:
+            (Path or None): the oldest pending record, None if there is none
+        """
+        return next(iter(self.index), None)
+
+    def remove(self, record_path: Path):
+        """
+        Delete a record and drop it from the index.
+        """
+        record_path.unlink(missing_ok=True)
+        self.index.pop(record_path, None)
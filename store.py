@@ -0,0 +1,83 @@
+"""
+This module provides a small persistent key-value store
+that keeps each record in its own JSON file.
+
+Classes:
+    - JsonStore: a directory of JSON records.
+
+Example usage:
+
+    store = JsonStore(Path('./rotation/journal'))
+    store.put('record', {'key': 'value'})
+    for key, data in store.items():
+        print(key, data)
+    store.delete('record')
+"""
+
+from os import replace
+from json import dump, load
+from pathlib import Path
+
+class JsonStore:
+    """
+    A directory of JSON records, one file per key.
+
+    Records are written to a temporary file first and renamed over
+    the target, so a process killed mid-write never leaves a partial record.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path (pathlib.Path): the directory to keep the records in,
+                                 created if missing
+        """
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def record_path(self, key: str) -> Path:
+        """
+        Returns:
+            Path: the file path of a record
+        """
+        return self.path / f'{key}.json'
+
+    def put(self, key: str, data: dict):
+        """
+        Create or replace a record.
+
+        Args:
+            key (str): record key; must be a valid file name
+            data (dict): JSON-serializable record data
+        """
+        record_path = self.record_path(key)
+        tmp_path = record_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as record_file:
+            dump(data, record_file, ensure_ascii=False)
+        replace(tmp_path, record_path)
+
+    def get(self, key: str):
+        """
+        Returns:
+            (dict or None): record data, None if there is no such record
+        """
+        try:
+            with open(self.record_path(key), 'r', encoding='utf-8') as record_file:
+                return load(record_file)
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str):
+        """
+        Remove a record, if it exists.
+        """
+        self.record_path(key).unlink(missing_ok=True)
+
+    def items(self):
+        """
+        Yields:
+            (tuple): (key, data) pairs of all stored records
+        """
+        for record_path in sorted(self.path.glob('*.json')):
+            with open(record_path, 'r', encoding='utf-8') as record_file:
+                yield record_path.stem, load(record_file)
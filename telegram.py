@@ -3,20 +3,27 @@ This module is responsible for creating and managing a Telegram bot.
 It also contains the related utility functions.
 
 Classes:
+    - PooledAiohttpSession: aiogram session using a shared connection pool.
     - TriageTelegramBot: Telegram bot class for the Triage bot.
 """
 
 import asyncio
+from html import escape
 from json import dumps, loads
-from logging import error
+from logging import error, warning
+from time import monotonic
+from collections import OrderedDict
+from aiohttp import ClientTimeout
 from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.filters import Command
 from aiogram.filters.command import CommandObject
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import Message
 from aiogram.types.inline_keyboard_button import InlineKeyboardButton
 from aiogram.types.callback_query import CallbackQuery
-from aiogram.exceptions import TelegramBadRequest
+from aiogram.exceptions import AiogramError, TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import GetUpdates
 from hash import title_id_generator
 
 async def generate_keyboard(cnt=0) -> InlineKeyboardBuilder:
@@ -70,26 +77,98 @@ async def render_feedback_msg(data: dict) -> str:
            data.get('feedback')
     return text
 
+async def render_issue_msg(status: str, url: str, title: str) -> str:
+    """
+    Render a message linking a GitHub issue.
+
+    Args:
+        status (str): issue status, like "New issue available"
+        url (str): issue URL
+        title (str): issue title
+
+    Returns:
+        str: A formatted message to replace the feedback message with.
+    """
+    # The titles of the existing issues come from GitHub as plain text
+    return f'{status}:\n<a href="{escape(url, quote=True)}">{escape(title)}</a>.'
+
+class PooledAiohttpSession(AiohttpSession):
+    """
+    aiogram session that sends the Bot API requests
+    through the shared "telegram" connection pool.
+    """
+
+    def __init__(self, pools, **kwargs):
+        """
+        Args:
+            pools (ConnectionPools): the shared connection pools
+        """
+        super().__init__(
+            timeout=pools.settings('telegram')['total_timeout'], **kwargs
+        )
+        self.pools = pools
+
+    async def create_session(self):
+        return self.pools.session('telegram')
+
+    async def make_request(self, bot, method, timeout=None):
+        """
+        aiogram passes a numeric timeout with every request, which aiohttp
+        would turn into a total-only timeout replacing the pool's one;
+        pass the complete timeout, with the pool's connection timeout, instead.
+        """
+        request_timeout = ClientTimeout(
+            total=self.timeout if timeout is None else timeout,
+            connect=self.pools.settings('telegram')['connect_timeout']
+        )
+        return await super().make_request(bot, method, timeout=request_timeout)
+
+    async def close(self):
+        """
+        The shared pool is closed by its owner, on the bot shutdown.
+        """
+
 class TriageTelegramBot:
     """
     Telegram part of the bot.
 
     Example usage:
-        bot = TriageTelegramBot("YOUR_BOT_TOKEN", "YOUR_TELEGRAM_GROUP_ID", 5, github_sender)
+        bot = TriageTelegramBot(
+            "YOUR_BOT_TOKEN", config, github_sender,
+            issue_journal, message_index, tenants, pools
+        )
         await asyncio.gather(bot.runner())
     """
 
-    def __init__(self, token, config, github_sender):
+    def __init__(self, token, config, github_sender,
+                 issue_journal, message_index, tenants, pools):
+        # pylint: disable=too-many-arguments
         self.running = True
+        self.stopping = asyncio.Event()
         self.router = Router()
         self.dispatcher = Dispatcher()
-        self.bot = Bot(token, parse_mode='HTML')
+        self.pools = pools
+        self.bot = Bot(
+            token, parse_mode='HTML', session=PooledAiohttpSession(pools)
+        )
+        self.bot.session.middleware(self.track_polling)
+        self.last_poll = None
         self.dispatcher.include_router(self.router)
         self.dispatcher.shutdown.register(self.stop)
         self.dispatcher.callback_query.register(self.process_feedback_button_click)
-        self.telegram_group_id = config.get('telegram_group_id')
         self.github_sender = github_sender
         self.config = config
+        self.tenants = tenants
+        # Issues being created are journaled, so that an interrupted
+        # instance leaves them for the next one to finish
+        self.issue_journal = issue_journal
+        # Tasks publishing the journaled issues, awaited on shutdown
+        self.in_flight = set()
+        # Messages linking each issue, updated on the GitHub webhook events
+        self.message_index = message_index
+        # Message index records with pending status edits, sent by the rotation
+        self.status_queue = OrderedDict()
+        self.status_edits_paused_until = 0
         # Register commands
         self.register_commands()
 
@@ -99,6 +178,27 @@ class TriageTelegramBot:
         Required for a normal shutdown cycle.
         """
         self.running = False
+        self.stopping.set()
+
+    async def track_polling(self, make_request, bot, method):
+        """
+        Session middleware that records the time of the last successful
+        `getUpdates` call, used by the readiness probe.
+        """
+        result = await make_request(bot, method)
+        if isinstance(method, GetUpdates):
+            self.last_poll = monotonic()
+        return result
+
+    def seconds_since_last_poll(self):
+        """
+        Returns:
+            (float or None): seconds since the last successful Telegram poll,
+                             None if the bot has not polled yet
+        """
+        if self.last_poll is None:
+            return None
+        return monotonic() - self.last_poll
 
     # Commands
     def register_commands(self):
@@ -111,6 +211,9 @@ class TriageTelegramBot:
         - change_repository: changes a GitHub issue repository.
         - change_triage_threshold: changes the minimal triage votes
 
+        The repository and threshold commands apply to the tenant
+        whose Telegram group the command is sent to.
+
         Note: This method should be called during the initialization phase of the bot
         to ensure all commands are registered before the bot starts processing messages.
         """
@@ -134,18 +237,23 @@ class TriageTelegramBot:
     async def command_register_group(
         self,
         message: Message,
-        _
+        command: CommandObject
     ) -> None:
         """
-        This handler registers the group with `/register_group` command
+        This handler registers the group with `/register_group` command,
+        for the default tenant or for the tenant named in the arguments
 
         Args:
             message (Message): an aiogram message instance
         """
-        self.config.set('telegram_group_id', message.chat.id)
-        self.config.save()
+        tenant_name = (command.args or 'default').strip()
+        tenant = self.tenants.get(tenant_name)
+        if tenant is None:
+            await message.answer(f'Unknown tenant: "{tenant_name}"')
+            return
+        tenant.set('telegram_group_id', message.chat.id)
         await message.answer(
-            f"Group is registered as default: <code>{message.chat.id}</code>"
+            f"Group is registered for {tenant.name}: <code>{message.chat.id}</code>"
         )
 
     async def command_change_rotation_interval(
@@ -187,9 +295,9 @@ class TriageTelegramBot:
             if github_repository.startswith(github_str):
                 github_repository = github_repository.replace(github_str, '')
             response: str = 'GitHub repository changed'
-            if '/' in command.args:
-                self.config.set('github_repository', command.args)
-                self.config.save()
+            if '/' in github_repository:
+                tenant = self.tenants.by_chat(message.chat.id)
+                tenant.set('github_repository', github_repository)
             else:
                 response = f'Invalid repository format: "{command.args}"'
             await message.answer(response)
@@ -214,8 +322,8 @@ class TriageTelegramBot:
         response: str = 'Triage vote threshold changed'
         try:
             min_votes: int = int(command.args, 10)
-            self.config.set('triage_threshold', min_votes)
-            self.config.save()
+            tenant = self.tenants.by_chat(message.chat.id)
+            tenant.set('triage_threshold', min_votes)
         except ValueError:
             response = f'Invalid vote count format: "{command.args}"'
         await message.answer(response)
@@ -249,7 +357,8 @@ class TriageTelegramBot:
                 # This part can be ignored safely.
                 pass
         # Create a new issue asynchronously (using a thread)
-        if vote_count >= self.config.get('triage_threshold'):
+        tenant = self.tenants.by_chat(cbq.message.chat.id)
+        if vote_count >= tenant.get('triage_threshold'):
             await self.send_feedback_to_github(cbq.message)
 
     async def send_feedback_to_github(self, tg_message):
@@ -259,36 +368,286 @@ class TriageTelegramBot:
         Args:
             tg_message (aiogram.types.message.Message): a Telegram message instance
         """
-        title = title_id_generator()
-        issue_coro = asyncio.to_thread(
-            self.github_sender.create_issue,
-            title,
-            tg_message.text
+        key = f'{tg_message.chat.id}_{tg_message.message_id}'
+        if self.issue_journal.get(key) is not None:
+            # Another vote has already started creating this issue
+            return
+        tenant = self.tenants.by_chat(tg_message.chat.id)
+        entry = {
+            'repository': tenant.get('github_repository'),
+            'chat_id': tg_message.chat.id,
+            'message_id': tg_message.message_id,
+            'title': title_id_generator(),
+            'text': tg_message.text
+        }
+        self.issue_journal.put(key, entry)
+        await asyncio.shield(self.track(self.publish_issue(key, entry)))
+
+    def track(self, coro):
+        """
+        Run an issue publication as a task that shutdown waits for.
+
+        Only the coroutines publishing journaled issues are tracked:
+        `drain` reports the unfinished ones as left in the journal.
+
+        Args:
+            coro (coroutine): the coroutine to run
+
+        Returns:
+            (asyncio.Task): the created task
+        """
+        task = asyncio.create_task(coro)
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+        return task
+
+    async def publish_issue(self, key, entry):
+        """
+        Creates a GitHub issue for a journaled entry (using a thread),
+        edits the Telegram message to link it and removes the journal entry.
+
+        If the local issue index has a similar open issue about the same page,
+        the feedback is added to it as a comment instead.
+
+        Args:
+            key (str): journal key
+            entry (dict): journal entry with the repository, the chat and message IDs,
+                          the issue title and text, and the issue URL
+                          if the issue was already created
+        """
+        if 'issue_url' not in entry:
+            try:
+                await self.create_or_comment_issue(key, entry)
+            except Exception:
+                # Let the next vote retry it; only interrupted
+                # creations are left in the journal
+                self.issue_journal.delete(key)
+                raise
+        if entry.get('duplicate'):
+            status = 'Duplicate of an existing issue'
+        else:
+            status = 'New issue available'
+        self.remember_issue_message(entry, status)
+        try:
+            await self.bot.edit_message_text(
+                await render_issue_msg(status, entry['issue_url'], entry['title']),
+                chat_id=entry['chat_id'],
+                message_id=entry['message_id']
+            )
+        except TelegramBadRequest as exc:
+            # The message was deleted or can not be edited anymore
+            warning(f"Unable to link issue {entry['issue_url']}: {exc}")
+        self.issue_journal.delete(key)
+
+    async def create_or_comment_issue(self, key, entry):
+        """
+        Creates a GitHub issue for a journal entry, or comments on
+        a duplicate issue, and fills in the entry's issue URL.
+
+        The result is journaled in the worker thread itself: cancelling
+        the task on shutdown does not stop the thread, so the GitHub call
+        may finish after the deadline, and the next instance must see
+        that it was made.
+
+        Args:
+            key (str): journal key
+            entry (dict): journal entry
+        """
+        index = self.github_sender.index_for(entry.get('repository'))
+        duplicate = index.find_duplicate(
+            entry['text'], self.config.get('duplicate_threshold', 0.5)
         )
-        issue_url = await issue_coro
-        await tg_message.edit_text(
-            (
-                f'New issue available:\n'
-                f'<a href="{issue_url}">{title}</a>.'
+        if duplicate is not None:
+            def comment_issue():
+                self.github_sender.comment_issue(
+                    duplicate['number'],
+                    f'The same feedback was received again:\n\n{entry["text"]}',
+                    entry.get('repository')
+                )
+                entry['title'] = duplicate['title']
+                entry['issue_url'] = duplicate['url']
+                entry['issue_number'] = duplicate['number']
+                entry['duplicate'] = True
+                self.issue_journal.put(key, entry)
+            await asyncio.to_thread(comment_issue)
+            return
+        def create_issue():
+            entry['issue_url'] = self.github_sender.create_issue(
+                entry['title'],
+                entry['text'],
+                entry.get('repository')
             )
+            entry['issue_number'] = int(entry['issue_url'].rsplit('/', 1)[-1])
+            self.issue_journal.put(key, entry)
+        await asyncio.to_thread(create_issue)
+        # Index the new issue right away, so that it is found
+        # before the next synchronization
+        index.add(
+            entry['issue_number'], entry['title'], entry['text'], entry['issue_url']
         )
 
+    @staticmethod
+    def issue_key(repository, number):
+        """
+        GitHub repository names are case-insensitive, and the webhook
+        reports them in their canonical case, so the key is lowercased.
+
+        Returns:
+            str: the message index key of an issue
+        """
+        return f'{repository.lower().replace("/", "__")}_{number}'
+
+    def remember_issue_message(self, entry, status):
+        """
+        Record the Telegram message linking an issue in the message index.
+
+        Args:
+            entry (dict): journal entry with the issue URL and number
+            status (str): the issue status shown in the message
+        """
+        repository = entry.get('repository') or self.github_sender.repository
+        number = entry.get('issue_number') or int(entry['issue_url'].rsplit('/', 1)[-1])
+        key = self.issue_key(repository, number)
+        record = self.status_queue.get(key) or self.message_index.get(key) or {
+            'title': entry['title'], 'url': entry['issue_url'], 'messages': []
+        }
+        message = {
+            'chat_id': entry['chat_id'],
+            'message_id': entry['message_id'],
+            'status': status
+        }
+        if message not in record['messages']:
+            record['messages'].append(message)
+        self.message_index.put(key, record)
+
+    def update_issue_status(self, repository, number, status):
+        """
+        Record a new status for the Telegram messages linking an issue.
+
+        The messages are marked as pending in the message index and edited
+        by `send_status_edits`, so the edits survive a restart.
+
+        Args:
+            repository (str): the repository of the issue
+            number (int): issue number
+            status (str): the new issue status, like "Issue closed"
+        """
+        key = self.issue_key(repository, number)
+        record = self.status_queue.get(key) or self.message_index.get(key)
+        if record is None:
+            return
+        for message in record['messages']:
+            message['status'] = status
+            message['pending'] = True
+        self.message_index.put(key, record)
+        self.status_queue[key] = record
+
+    async def send_status_edits(self):
+        """
+        Edit the Telegram messages with pending status changes,
+        each within the rate budget of the tenant owning its chat.
+
+        The edits out of budget or failed for a transient reason stay pending
+        for the next call; after a "Too Many Requests" response,
+        no edits are sent for the time Telegram asks to wait.
+        """
+        if monotonic() < self.status_edits_paused_until:
+            return
+        for key, record in list(self.status_queue.items()):
+            changed = False
+            try:
+                for message in record['messages']:
+                    if not message.get('pending'):
+                        continue
+                    tenant = self.tenants.by_chat(message['chat_id'])
+                    if not tenant.rate_budget.try_acquire():
+                        continue
+                    status = message['status']
+                    try:
+                        await self.bot.edit_message_text(
+                            await render_issue_msg(status, record['url'], record['title']),
+                            chat_id=message['chat_id'],
+                            message_id=message['message_id']
+                        )
+                    except TelegramBadRequest as exc:
+                        # The message was deleted or already shows the status
+                        warning(f"Unable to update issue {record['url']}: {exc}")
+                    except TelegramRetryAfter as exc:
+                        self.status_edits_paused_until = monotonic() + exc.retry_after
+                        return
+                    except AiogramError as exc:
+                        warning(f"Unable to update issue {record['url']}, will retry: {exc}")
+                        continue
+                    # A webhook event may have changed the status in the meantime
+                    if message['status'] == status:
+                        del message['pending']
+                        changed = True
+            finally:
+                if changed:
+                    self.message_index.put(key, record)
+                if not any(message.get('pending') for message in record['messages']):
+                    self.status_queue.pop(key, None)
+
+    def resume_status_edits(self):
+        """
+        Queue the status edits that a previous instance left pending.
+        """
+        for key, record in self.message_index.items():
+            if any(message.get('pending') for message in record['messages']):
+                self.status_queue[key] = record
+
+    def resume_pending_issues(self):
+        """
+        Finish the issues that a previous instance left in the journal.
+        """
+        for key, entry in self.issue_journal.items():
+            self.track(self.publish_issue(key, entry))
+
+    async def drain(self, timeout):
+        """
+        Wait for the in-flight issues to be published.
+        The ones unfinished by the deadline are cancelled
+        and remain in the journal. The pending status edits
+        are not awaited: they remain in the message index.
+
+        A GitHub call already running in a worker thread can not be
+        cancelled, so it may outlast the deadline; the process exits
+        once it returns, and its result is journaled for the next instance.
+
+        Args:
+            timeout (float): seconds to wait
+
+        Returns:
+            (int): the number of issues left in the journal
+        """
+        if self.in_flight:
+            _, pending = await asyncio.wait(set(self.in_flight), timeout=timeout)
+            for task in pending:
+                task.cancel()
+        # Count what the next instance will resume, rather than the tasks
+        return sum(1 for _ in self.issue_journal.items())
+
     async def runner(self) -> None:
         """
         Returns:
             (coroutine): bot coroutine
         """
-        await self.dispatcher.start_polling(self.bot)
+        self.resume_pending_issues()
+        self.resume_status_edits()
+        # Signals are handled by the bot lifecycle in bot.py
+        await self.dispatcher.start_polling(self.bot, handle_signals=False)
 
-    async def send_to_telegram_group_id(self, text: str, **kwargs):
+    async def send_to_telegram_group_id(self, text: str, tenant=None, **kwargs):
         """
         Send a text to the chat with a current telegram_group_id.
 
         Args:
             text (str): a string to be sent
+            tenant (Tenant): the tenant to send it to, the default one if None
         """
+        tenant = tenant or self.tenants.default
         return await self.bot.send_message(
-            chat_id=self.telegram_group_id,
+            chat_id=tenant.get('telegram_group_id'),
             text=text,
             **kwargs
         )
@@ -0,0 +1,188 @@
+"""
+This module routes feedback between several documentation sites
+served by a single bot instance.
+
+Each tenant has its own Telegram group, GitHub repository, triage threshold,
+rotation (spool) partition and Telegram rate budget. The top-level config
+keys describe the "default" tenant, and the other tenants are described in
+the "tenants" config section:
+
+    {
+        "telegram_group_id": "<DEFAULT_GROUP_ID>",
+        "github_repository": "<USERNAME>/<REPOSITORY_NAME>",
+        "tenants": {
+            "wiki": {
+                "site_token": "<RANDOM_STRING>",
+                "telegram_group_id": "<WIKI_GROUP_ID>",
+                "github_repository": "<USERNAME>/<WIKI_REPOSITORY_NAME>",
+                "triage_threshold": 2
+            }
+        }
+    }
+
+Classes:
+    - RateBudget: a token bucket limiting the messages sent per minute.
+    - Tenant: a single documentation site.
+    - TenantRegistry: all tenants of the bot.
+"""
+
+from collections import deque
+from time import monotonic
+from pathlib import Path
+from spool import Spool
+
+class RateBudget:
+    """
+    A token bucket that allows `rate` messages per minute,
+    in bursts of up to `rate` messages.
+    """
+
+    def __init__(self, rate):
+        """
+        Args:
+            rate (int): messages per minute
+        """
+        self.rate = rate
+        self.tokens = float(rate)
+        self.updated = monotonic()
+
+    def try_acquire(self) -> bool:
+        """
+        Take a token from the bucket, if there is one.
+
+        Returns:
+            bool: True if a message can be sent now
+        """
+        now = monotonic()
+        self.tokens = min(
+            self.rate, self.tokens + (now - self.updated) * self.rate / 60
+        )
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class Tenant:
+    """
+    A documentation site served by the bot.
+    """
+
+    # Settings that a tenant inherits from the top-level config
+    inherited = ('github_repository', 'triage_threshold', 'telegram_rate_limit')
+
+    def __init__(self, name, config, settings, spool_path: Path):
+        """
+        Args:
+            name (str): tenant name, used in the `/feedback/<name>` route
+            config (Config): bot configuration
+            settings (dict or None): the tenant's config section,
+                                     None for the default tenant
+            spool_path (pathlib.Path): the tenant's rotation partition
+        """
+        self.name = name
+        self.config = config
+        self.settings = settings
+        self.spool = Spool(spool_path)
+        self.rate_budget = RateBudget(self.get('telegram_rate_limit', 20))
+
+    def get(self, key, default=None):
+        """
+        Get a tenant setting.
+
+        Returns:
+            Any: the tenant's own value, the top-level value for
+                 the inherited settings, or the default
+        """
+        if self.settings is None:
+            return self.config.get(key, default)
+        if key in self.settings:
+            return self.settings[key]
+        if key in self.inherited:
+            return self.config.get(key, default)
+        return default
+
+    def set(self, key, value):
+        """
+        Change a tenant setting and save the configuration.
+        """
+        if self.settings is None:
+            self.config.set(key, value)
+        else:
+            self.settings[key] = value
+        self.config.save()
+
+    def owns_chat(self, chat_id) -> bool:
+        """
+        Returns:
+            bool: True if the chat is the tenant's Telegram group
+        """
+        return str(self.get('telegram_group_id')) == str(chat_id)
+
+class TenantRegistry:
+    """
+    All tenants of the bot, keyed by name.
+
+    The default tenant keeps its feedback records in the rotation directory,
+    the others in `<rotation directory>/tenants/<name>`.
+    """
+
+    def __init__(self, config, rotation_path: Path):
+        """
+        Args:
+            config (Config): bot configuration
+            rotation_path (pathlib.Path): path for file rotation
+
+        Raises:
+            ValueError: If a tenant in the config is named "default".
+        """
+        self.default = Tenant('default', config, None, rotation_path)
+        self.tenants = {self.default.name: self.default}
+        for name, settings in config.get('tenants', {}).items():
+            if name == self.default.name:
+                raise ValueError('The "default" tenant name is reserved.')
+            self.tenants[name] = Tenant(
+                name, config, settings, rotation_path / 'tenants' / name
+            )
+        self.order = deque(self.tenants.values())
+
+    def __iter__(self):
+        return iter(self.tenants.values())
+
+    def get(self, name):
+        """
+        Returns:
+            (Tenant or None): the tenant with the given name
+        """
+        return self.tenants.get(name)
+
+    def by_token(self, site_token):
+        """
+        Returns:
+            (Tenant or None): the tenant with the given site token
+        """
+        for tenant in self:
+            if site_token and tenant.get('site_token') == site_token:
+                return tenant
+        return None
+
+    def by_chat(self, chat_id):
+        """
+        Returns:
+            Tenant: the tenant owning the Telegram chat,
+                    the default tenant if there is none
+        """
+        for tenant in self:
+            if tenant is not self.default and tenant.owns_chat(chat_id):
+                return tenant
+        return self.default
+
+    def round_robin(self):
+        """
+        Returns:
+            (list): all tenants, starting one tenant further on every call,
+                    so that none of them is always served first
+        """
+        tenants = list(self.order)
+        self.order.rotate(-1)
+        return tenants
@@ -4,8 +4,8 @@ Classes:
 
 Example usage:
 
-    rotation_path = Path('./rotation')
-    server = TriageWebServer(rotation_path)
+    tenants = TenantRegistry(config, Path('./rotation'))
+    server = TriageWebServer(tenants)
     await server.start_http_server(
         bot=telegram_bot,
         address='0.0.0.0',
@@ -13,21 +13,36 @@ Example usage:
     )
 """
 
-from pathlib import Path
-from json import dumps
+from json import dumps, loads
+from hashlib import sha256
+from hmac import HMAC, compare_digest
 from aiohttp import web
-from hash import file_id_generator
 
 class TriageWebServer:
     """
     HTTP server class for the triage bot.
     """
 
-    def __init__(self, rotation_path: Path):
+    # GitHub issue webhook actions and the statuses they set
+    issue_statuses = {
+        'closed': 'Issue closed',
+        'reopened': 'Issue reopened'
+    }
+
+    def __init__(self, tenants, shutdown_timeout=8, webhook_secret=None):
         """
         Pre-configure the runner.
+
+        Args:
+            tenants (TenantRegistry): tenants to accept the feedback for
+            shutdown_timeout (float): seconds to wait for the in-flight requests
+                                      when the server stops
+            webhook_secret (str): GitHub webhook secret;
+                                  the webhook is disabled if None
         """
-        self.rotation_path = rotation_path
+        self.tenants = tenants
+        self.shutdown_timeout = shutdown_timeout
+        self.webhook_secret = webhook_secret
         self.runner = None
 
     async def serve_main_page(self, _):
@@ -37,24 +52,80 @@ class TriageWebServer:
         """
         return web.Response(text='Feedback processing server is working.')
 
-    def generate_feedback_path(self) -> Path:
+    async def serve_readiness(self, request):
         """
+        Readiness probe: reports the spool depth,
+        the time since the last successful Telegram poll,
+        the GitHub API reachability and the connection pool statistics.
+        The probe makes no outbound requests: the reachability
+        is the cached result of a background check.
+
+        The probe fails with 503 if the bot has not polled Telegram
+        within the `healthcheck_poll_timeout` config interval.
+
         Returns:
-            Path: the path for a new feedback rotation record
+            (Response): aiohttp JSON response
+        """
+        bot = request.app['bot']
+        poll_age = bot.seconds_since_last_poll()
+        poll_timeout = bot.config.get('healthcheck_poll_timeout', 60)
+        ready = poll_age is not None and poll_age <= poll_timeout
+        spool_depths = {
+            tenant.name: len(tenant.spool)
+            for tenant in self.tenants
+        }
+        report = {
+            'ready': ready,
+            'spool_depth': sum(spool_depths.values()),
+            'tenant_spool_depths': spool_depths,
+            'seconds_since_last_poll': poll_age,
+            'github_reachable': bot.github_sender.is_reachable(),
+            'http_pools': bot.pools.stats()
+        }
+        return web.json_response(report, status=200 if ready else 503)
+
+    def resolve_tenant(self, request):
         """
-        return self.rotation_path / f'{file_id_generator()}.json'
+        Find the tenant of a feedback request: by the `/feedback/<tenant>` path,
+        by the site token in the `X-Site-Token` header or `site_token` query parameter,
+        or the default one. A tenant with a `site_token` setting
+        only accepts the requests carrying it.
+
+        Returns:
+            (Tenant or None): the tenant, None if the request matches none
+        """
+        site_token = request.headers.get('X-Site-Token') or \
+                     request.query.get('site_token')
+        name = request.match_info.get('tenant')
+        if name is not None:
+            tenant = self.tenants.get(name)
+        elif site_token:
+            tenant = self.tenants.by_token(site_token)
+        else:
+            tenant = self.tenants.default
+        if tenant is None:
+            return None
+        expected_token = tenant.get('site_token')
+        if expected_token and \
+           not compare_digest(str(site_token or ''), str(expected_token)):
+            return None
+        return tenant
 
     async def handle_feedback_request(self, request):
         """
         Returns:
             Response: the result of the feedback processing
         """
+        tenant = self.resolve_tenant(request)
+        if tenant is None:
+            return web.Response(
+                text='Unknown site; unable to send feedback.', status=404
+            )
         status = 200
         response_text = 'Feedback processed'
         request_data: str = dumps(await request.json())
         try:
-            with open(self.generate_feedback_path(), 'w', encoding='utf-8') as fb_file:
-                fb_file.write(request_data)
+            tenant.spool.write(request_data)
         except PermissionError:
             status = 500
             response_text = 'Incorrect permissions; unable to send feedback.'
@@ -66,6 +137,60 @@ class TriageWebServer:
             response_text = 'An I/O error occurred; unable to send feedback.'
         return web.Response(text=response_text, status=status)
 
+    def verify_signature(self, body: bytes, signature: str) -> bool:
+        """
+        Check the `X-Hub-Signature-256` header of a GitHub webhook request.
+
+        Args:
+            body (bytes): raw request body
+            signature (str): header value, like "sha256=<hex digest>"
+
+        Returns:
+            bool: True if the body is signed with the webhook secret
+        """
+        digest = HMAC(self.webhook_secret.encode(), body, sha256).hexdigest()
+        # Compare bytes: compare_digest rejects non-ASCII strings, and aiohttp
+        # keeps undecodable header bytes as surrogate escapes
+        return compare_digest(
+            f'sha256={digest}'.encode(),
+            (signature or '').encode('utf-8', 'surrogateescape')
+        )
+
+    async def handle_github_webhook(self, request):
+        """
+        Reflect the GitHub issue state changes in the Telegram messages
+        linking the issues.
+
+        Returns:
+            Response: the result of the event processing
+        """
+        if self.webhook_secret is None:
+            return web.Response(text='GitHub webhook is not configured.', status=404)
+        body = await request.read()
+        if not self.verify_signature(body, request.headers.get('X-Hub-Signature-256')):
+            return web.Response(text='Invalid signature.', status=401)
+        if request.headers.get('X-GitHub-Event') != 'issues':
+            return web.Response(text='Event ignored')
+        try:
+            payload = loads(body)
+            status = self.issue_statuses.get(payload.get('action'))
+            if status is None:
+                return web.Response(text='Event ignored')
+            if payload['issue'].get('state_reason') == 'not_planned':
+                status = 'Issue closed as not planned'
+            repository = payload['repository']['full_name'].lower()
+            number = payload['issue']['number']
+            state = payload['issue']['state']
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return web.Response(text='Malformed event payload.', status=400)
+        bot = request.app['bot']
+        index = bot.github_sender.indexes.get(repository)
+        if index is not None:
+            index.set_state(number, state)
+        # The edits are sent by the rotation, within the tenant rate budgets
+        bot.update_issue_status(repository, number, status)
+        return web.Response(text='Event processed')
+
     async def start_http_server(self, address='0.0.0.0', port=8080, bot=None):
         """
         Start an AsyncIO server.
@@ -73,17 +198,28 @@ class TriageWebServer:
         Args:
             address (str): server address string, typically 0.0.0.0
             port (int): server port
-            rotation_path (pathlib.Path): path for file rotation
             bot (TriageTelegramBot): bot instance
         """
         app = web.Application()
         app['bot'] = bot
         app.add_routes([
             web.get('/', self.serve_main_page),
-            web.post('/feedback', self.handle_feedback_request)
+            web.get('/healthz', self.serve_readiness),
+            web.post('/feedback', self.handle_feedback_request),
+            web.post('/feedback/{tenant}', self.handle_feedback_request),
+            web.post('/github/webhook', self.handle_github_webhook)
         ])
-        self.runner = web.AppRunner(app)
+        self.runner = web.AppRunner(app, shutdown_timeout=self.shutdown_timeout)
         await self.runner.setup()
         site = web.TCPSite(self.runner, address, port)
         await site.start()
         return self
+
+    async def stop(self):
+        """
+        Stop accepting connections and wait for the in-flight requests
+        for up to `shutdown_timeout` seconds.
+        """
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None